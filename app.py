@@ -1,8 +1,6 @@
 from flask import Flask, render_template, Response, request
 import io
 import base64
-from PIL import Image
-import numpy as np
 import os
 import sys
 import logging
@@ -10,6 +8,10 @@ import json
 import traceback
 import time
 import socket
+import secrets
+import threading
+import metrics
+import streaming
 
 # Configure logging
 logging.basicConfig(
@@ -26,57 +28,156 @@ if os.environ.get('DISPLAY') is None:
 
 app = Flask(__name__)
 
+# Hot-path instrumentation, exposed at /metrics. Client labels come from
+# request headers, so each per-client metric keeps at most MAX_CLIENT_LABELS
+# series and counts everyone after that under client="other".
+MAX_CLIENT_LABELS = 100
+stream_timer = metrics.StageTimer('racer_stream_stage_seconds', 'Time spent in each frame streaming stage')
+streams_active = metrics.LabeledValue('racer_streams_active', 'Open /game streams per client',
+                                      kind='gauge', label='client', max_keys=MAX_CLIENT_LABELS)
+streams_total = metrics.LabeledValue('racer_streams_total', 'Total /game streams opened per client',
+                                     label='client', max_keys=MAX_CLIENT_LABELS)
+frames_sent = metrics.LabeledValue('racer_frames_sent_total', 'Frames sent per client', label='client',
+                                   max_keys=MAX_CLIENT_LABELS)
+stream_levels = metrics.LabeledValue('racer_stream_level', 'Adaptive streaming ladder level per stream',
+                                     kind='gauge', label='stream')
+
 # Global variables
+# The game is created lazily on first use (or by warm_up()) so importing this
+# module, and serving /health, does not pay for pygame, PIL and NumPy.
 pygame_available = False
 game_instance = None
 last_error = None
 initialization_attempted = False
+_init_lock = threading.Lock()
+
+# Adaptive streams by id, fed by client reports to /stream/<id>/feedback.
+# This lives in the worker's memory, so the app must run as one worker process
+# (see gunicorn.conf.py).
+adaptive_streams = {}
+
+# The shared game runs on its own clock at SIMULATION_HZ, whatever rate the
+# streams sample it at. Streams on different threads share one pygame surface,
+# so ticking, rendering and resetting all happen under _game_lock.
+SIMULATION_HZ = 60
+MAX_CATCH_UP_TICKS = 10
+_game_lock = threading.Lock()
+_last_tick_time = None
+_last_frame = None
 
 def initialize_game():
     global pygame_available, game_instance, last_error, initialization_attempted
     if initialization_attempted:
-        logger.info("Game initialization already attempted")
         return pygame_available
     
-    initialization_attempted = True
-    try:
-        logger.info("Attempting to import pygame...")
-        import pygame
-        logger.info("Pygame imported successfully")
-        
-        # Initialize pygame with error handling
-        logger.info("Initializing pygame...")
-        pygame.mixer.quit()  # Disable sound
-        pygame.init()
-        if pygame.get_error():
-            raise Exception(f"Pygame initialization error: {pygame.get_error()}")
-        logger.info("Pygame initialized successfully")
-        
-        # Import game module
-        logger.info("Attempting to import game module...")
-        import game
-        logger.info("Game module imported successfully")
-        
-        # Create game instance
-        logger.info("Creating game instance...")
-        game_instance = game.CarRacingGame()
-        pygame_available = True
-        last_error = None
-        logger.info("Game instance created successfully")
-        return True
-    except Exception as e:
-        last_error = str(e)
-        logger.error(f"Error initializing game: {e}")
-        logger.error(traceback.format_exc())
-        pygame_available = False
-        return False
+    with _init_lock:
+        # Another thread may have finished while we waited for the lock
+        if initialization_attempted:
+            return pygame_available
+        try:
+            logger.info("Attempting to import pygame...")
+            import pygame
+            logger.info("Pygame imported successfully")
+            
+            # Initialize pygame with error handling
+            logger.info("Initializing pygame...")
+            pygame.mixer.quit()  # Disable sound
+            pygame.init()
+            if pygame.get_error():
+                raise Exception(f"Pygame initialization error: {pygame.get_error()}")
+            logger.info("Pygame initialized successfully")
+            
+            # Import game module
+            logger.info("Attempting to import game module...")
+            import game
+            logger.info("Game module imported successfully")
+            
+            # Create game instance
+            logger.info("Creating game instance...")
+            game_instance = game.CarRacingGame()
+            pygame_available = True
+            last_error = None
+            logger.info("Game instance created successfully")
+        except Exception as e:
+            last_error = str(e)
+            logger.error(f"Error initializing game: {e}")
+            logger.error(traceback.format_exc())
+            pygame_available = False
+        finally:
+            initialization_attempted = True
+        return pygame_available
+
+def _warm_up():
+    start = time.perf_counter()
+    if initialize_game():
+        # Encode one frame so PIL and its PNG encoder are loaded too
+        encode_frame(advance_game())
+    logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s")
+
+def warm_up(background=True):
+    # Initialize the game ahead of the first request. Run in the foreground
+    # before forking (gunicorn preload) so the worker inherits the initialized game.
+    if not background:
+        _warm_up()
+        return None
+    thread = threading.Thread(target=_warm_up, name="game-warm-up", daemon=True)
+    thread.start()
+    return thread
 
-# Initialize game on startup
-initialize_game()
+def encode_frame(frame, format="PNG", quality=None, downscale=1):
+    from PIL import Image
 
-def generate_game_frames():
+    # Convert the frame to base64, optionally downscaled and lossy
+    img = Image.fromarray(frame)
+    if downscale > 1:
+        img = img.reduce(downscale)
+    buffer = io.BytesIO()
+    if quality is None:
+        img.save(buffer, format=format)
+    else:
+        img.save(buffer, format=format, quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+def advance_game():
+    # Bring the game up to the current time and return its latest frame.
+    # Streams that sample between ticks get the cached frame.
+    global _last_tick_time, _last_frame
+    with _game_lock:
+        now = time.perf_counter()
+        if _last_tick_time is None:
+            _last_tick_time = now
+        ticks = int((now - _last_tick_time) * SIMULATION_HZ)
+        if ticks > MAX_CATCH_UP_TICKS:
+            # Nobody was watching; resume from here instead of fast-forwarding
+            ticks = 1
+            _last_tick_time = now
+        else:
+            _last_tick_time += ticks / SIMULATION_HZ
+        if ticks == 0 and _last_frame is not None:
+            return _last_frame
+        with stream_timer.time('tick'):
+            for _ in range(ticks):
+                game_instance.update()
+        with stream_timer.time('capture'):
+            game_instance.render()
+            _last_frame = game_instance.capture_frame()
+        return _last_frame
+
+def generate_game_frames(client=None, adaptive=False):
     global last_error
+    active_key = streams_active.inc(key=client)
+    streams_total.inc(key=client)
+    stream_id = None
+    controller = None
     try:
+        if adaptive:
+            stream_id = secrets.token_hex(8)
+            controller = streaming.AdaptiveBitrate()
+            adaptive_streams[stream_id] = controller
+            logger.info(f"Adaptive stream {stream_id} opened for {client}")
+            yield f"data: {json.dumps({'stream': stream_id, 'level': controller.index})}\n\n"
+        next_frame_time = time.perf_counter()
+
         while True:
             if not pygame_available:
                 error_msg = last_error or "Pygame not available"
@@ -85,20 +186,39 @@ def generate_game_frames():
                 break
 
             try:
-                # Get the game frame
-                frame = game_instance.get_frame()
+                # Grab the current frame of the shared game
+                frame = advance_game()
                 if frame is None:
                     logger.warning("Received None frame from game")
                     continue
 
                 # Convert the frame to base64
-                img = Image.fromarray(frame)
-                buffer = io.BytesIO()
-                img.save(buffer, format="PNG")
-                img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
+                message = {}
+                with stream_timer.time('encode'):
+                    if controller is None:
+                        message['image'] = encode_frame(frame)
+                    else:
+                        level_index = controller.index
+                        level = controller.ladder[level_index]
+                        stream_levels.set(level_index, key=stream_id)
+                        message['image'] = encode_frame(frame, level.format, level.quality, level.downscale)
+                        message['format'] = level.format.lower()
+                        message['level'] = level_index
+
+                # Send the frame; the generator resumes once the server has written it
+                with stream_timer.time('send'):
+                    yield f"data: {json.dumps(message)}\n\n"
+                frames_sent.inc(key=client)
 
-                # Send the frame
-                yield f"data: {json.dumps({'image': img_str})}\n\n"
+                # Sample at the level's frame rate, or at the simulation rate
+                # for plain streams; the game keeps its own pace either way
+                fps = level.fps if controller is not None else SIMULATION_HZ
+                next_frame_time += 1.0 / fps
+                delay = next_frame_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_frame_time = time.perf_counter()
             except Exception as e:
                 logger.error(f"Error generating frame: {e}")
                 logger.error(traceback.format_exc())
@@ -110,6 +230,17 @@ def generate_game_frames():
         logger.error(f"Error in game stream: {e}")
         logger.error(traceback.format_exc())
         yield "data: " + json.dumps({"error": str(e)}) + "\n\n"
+    finally:
+        streams_active.dec(key=active_key, remove_at_zero=True)
+        if stream_id is not None:
+            adaptive_streams.pop(stream_id, None)
+            stream_levels.remove(stream_id)
+
+def client_address():
+    # Behind a proxy (Render included) remote_addr is the proxy; the first
+    # X-Forwarded-For hop is the real client
+    forwarded = request.headers.get('X-Forwarded-For', '')
+    return forwarded.split(',')[0].strip() or request.remote_addr
 
 @app.route('/')
 def index():
@@ -119,21 +250,47 @@ def index():
 @app.route('/game')
 def game_route():
     logger.info("Game route accessed")
-    if not pygame_available:
+    if not initialize_game():
         error_msg = last_error or "Pygame initialization failed"
         logger.error(f"Pygame not available in game route: {error_msg}")
         return Response(error_msg, status=500)
-    return Response(generate_game_frames(), mimetype='text/event-stream')
+    adaptive = request.args.get('adaptive') == '1'
+    return Response(generate_game_frames(client_address(), adaptive), mimetype='text/event-stream')
+
+@app.route('/stream/<stream_id>/feedback', methods=['POST'])
+def stream_feedback(stream_id):
+    controller = adaptive_streams.get(stream_id)
+    if controller is None:
+        return Response("Unknown stream", status=404)
+    data = request.get_json(silent=True) or {}
+    try:
+        frames = int(data['frames'])
+        elapsed = float(data['elapsed'])
+        decode_ms = float(data['decode_ms'])
+        level = int(data['level']) if data.get('level') is not None else None
+    except (KeyError, TypeError, ValueError):
+        return Response("Expected JSON with numeric frames, elapsed and decode_ms", status=400)
+    if frames < 0 or not elapsed > 0:
+        return Response("Expected a non-negative frame count over a positive elapsed time", status=400)
+    previous = controller.index
+    new_level = controller.report(frames, elapsed, decode_ms, level)
+    if new_level != previous:
+        logger.info(f"Stream {stream_id}: level {previous} -> {new_level} "
+                    f"({frames} frames in {elapsed:.2f}s, decode {decode_ms:.1f}ms)")
+    return {"level": new_level}
 
 @app.route('/reset', methods=['POST'])
 def reset_game():
+    global _last_frame
     logger.info("Reset game requested")
-    if not pygame_available:
+    if not initialize_game():
         error_msg = last_error or "Pygame not available"
         logger.error(f"Pygame not available in reset route: {error_msg}")
         return Response(error_msg, status=500)
     try:
-        game_instance.reset()
+        with _game_lock:
+            game_instance.reset()
+            _last_frame = None
         logger.info("Game reset successfully")
         return Response("Game reset", status=200)
     except Exception as e:
@@ -143,6 +300,8 @@ def reset_game():
 
 @app.route('/status')
 def status():
+    # The client checks status before opening the stream, so this counts as first use
+    initialize_game()
     hostname = socket.gethostname()
     ip_address = socket.gethostbyname(hostname)
     return {
@@ -157,6 +316,10 @@ def status():
         }
     }
 
+@app.route('/metrics')
+def metrics_route():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health_check():
     return Response("OK", status=200)
@@ -0,0 +1,454 @@
+import os
+
+# Run headless so the suite works on CI machines and servers without a display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import collections
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_BASELINE = os.path.join('benchmarks', 'baseline.json')
+DEFAULT_THRESHOLD = 0.2  # Allowed fractional slowdown before a metric counts as a regression
+
+
+def _measure(fn, number, repeat=3):
+    # Best-of-N wall time per call, in seconds
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def _rate(seconds_per_call):
+    return {"value": 1.0 / seconds_per_call, "unit": "calls/s", "higher_is_better": True}
+
+
+def _latency(seconds_per_call):
+    return {"value": seconds_per_call * 1000.0, "unit": "ms", "higher_is_better": False}
+
+
+def bench_env(results, scale):
+    from car_racing_env import CarRacingEnv, ACTIONS
+
+    # Disable the 60 FPS limiter so we measure the simulation, not the clock
+    env = CarRacingEnv(fps=None)
+    env.reset()
+    rng = np.random.default_rng(0)
+
+    def step():
+        _, _, done = env.step(ACTIONS[rng.integers(len(ACTIONS))])
+        if done:
+            env.reset()
+
+    def step_render():
+        step()
+        env.render()
+
+    results["env_step"] = _rate(_measure(step, 2000 * scale))
+    results["env_step_render"] = _rate(_measure(step_render, 200 * scale))
+
+    _check_batch_env_parity(rng)
+
+
+def _check_batch_env_parity(rng, num_envs=8, steps=500):
+    # BatchCarRacingEnv must step exactly like CarRacingEnv, episode end included
+    from car_racing_env import CarRacingEnv, BatchCarRacingEnv, ACTIONS
+
+    envs = [CarRacingEnv(fps=None) for _ in range(num_envs)]
+    for env in envs:
+        env.reset()
+    batch = BatchCarRacingEnv(num_envs)
+    batch.reset()
+    for t in range(steps):
+        indices = rng.integers(len(ACTIONS), size=num_envs)
+        states, rewards, dones = batch.step(np.array(ACTIONS, dtype=np.float64)[indices])
+        for i, env in enumerate(envs):
+            state, reward, done = env.step(ACTIONS[indices[i]])
+            if not (np.allclose(state, states[i]) and np.isclose(reward, rewards[i]) and done == dones[i]):
+                raise RuntimeError(f"BatchCarRacingEnv diverged from CarRacingEnv at step {t}, env {i}: "
+                                   f"{state}, {reward}, {done} != {states[i]}, {rewards[i]}, {dones[i]}")
+    logging.info(f"BatchCarRacingEnv matches CarRacingEnv over {steps} steps x {num_envs} envs")
+
+
+def bench_agent(results, scale):
+    from car_racing_env import ACTIONS
+    try:
+        from dqn_agent import DQNAgent
+    except ImportError as e:
+        logging.warning(f"Skipping DQNAgent benchmarks: {e}")
+        return
+
+    state_size = 8
+    batch_size = 32
+    agent = DQNAgent(state_size, len(ACTIONS))
+    rng = np.random.default_rng(0)
+
+    def random_state():
+        return rng.random((1, state_size))
+
+    for _ in range(batch_size * 4):
+        agent.remember(random_state(), int(rng.integers(len(ACTIONS))), float(rng.random()),
+                       random_state(), bool(rng.random() < 0.1))
+
+    # Greedy so every call goes through the network
+    agent.epsilon = 0.0
+    state = random_state()
+    results["agent_act"] = _rate(_measure(lambda: agent.act(state), 20 * scale))
+
+    # Keep epsilon pinned so replay does not stop decaying into a different code path
+    def replay():
+        agent.epsilon = 1.0
+        agent.replay(batch_size)
+
+    results["agent_replay"] = _rate(_measure(replay, max(1, scale), repeat=2))
+
+
+def bench_game(results, scale):
+    from game import CarRacingGame
+
+    game = CarRacingGame()
+    game.reset()
+
+    results["game_draw_car"] = _latency(_measure(
+        lambda: game._draw_car(game.car_x, game.car_y, 37.0, game.car_color), 2000 * scale))
+    results["game_render"] = _latency(_measure(game.render, 200 * scale))
+
+
+def bench_app(results, scale):
+    import app
+
+    app.logger.setLevel(logging.WARNING)
+    if not app.initialize_game():
+        logging.warning(f"Skipping app benchmarks: {app.last_error}")
+        return
+
+    frame = app.advance_game()
+    results["frame_encode"] = _latency(_measure(lambda: app.encode_frame(frame), 10 * scale))
+
+    # Plain streams are paced to SIMULATION_HZ. Raise it far beyond any real
+    # frame rate so the stream runs flat out and the timing covers tick,
+    # capture, encode and send instead of the pacing sleep; every frame then
+    # exceeds MAX_CATCH_UP_TICKS and runs exactly one tick.
+    simulation_hz = app.SIMULATION_HZ
+    app.SIMULATION_HZ = 1e9
+    try:
+        frames = 20 * scale
+        client = app.app.test_client()
+        response = client.get('/game', buffered=False)
+        stream = iter(response.response)
+        # The first frame includes generator start-up, so keep it out of the timing
+        next(stream)
+        start = time.perf_counter()
+        received = 0
+        for chunk in stream:
+            if b'"image"' in chunk:
+                received += 1
+                if received == frames:
+                    break
+        elapsed = time.perf_counter() - start
+        response.close()
+    finally:
+        app.SIMULATION_HZ = simulation_hz
+    results["game_stream_fps"] = {"value": received / elapsed, "unit": "frames/s", "higher_is_better": True}
+
+
+def bench_evaluate(results, scale):
+    from car_racing_env import ACTIONS
+    from evaluate import STATE_SIZE, evaluate_policies
+
+    # Random policies with DQNAgent's layer sizes stand in for checkpoints, so
+    # this runs without TensorFlow
+    rng = np.random.default_rng(0)
+    sizes = (STATE_SIZE, 24, 24, len(ACTIONS))
+    num_policies = 100
+    relu = lambda x: np.maximum(x, 0)
+    layers = []
+    for i, (fan_in, fan_out) in enumerate(zip(sizes, sizes[1:])):
+        kernel = rng.normal(scale=0.5, size=(num_policies, fan_in, fan_out))
+        bias = rng.normal(scale=0.5, size=(num_policies, 1, fan_out))
+        layers.append((kernel, bias, relu if i < len(sizes) - 2 else (lambda x: x)))
+
+    # The workload is fixed so eval_100x32_seconds compares across --scale;
+    # scale only adds repeats and the fastest one counts
+    policies, summary = evaluate_policies(layers, episodes=32, max_steps=1000, epsilon=0.05)
+    for _ in range(scale - 1):
+        _, repeat = evaluate_policies(layers, episodes=32, max_steps=1000, epsilon=0.05)
+        if repeat["seconds"] < summary["seconds"]:
+            summary = repeat
+    lengths = [policy["steps_mean"] for policy in policies]
+    returns = [policy["return_mean"] for policy in policies]
+    logging.info(f"Evaluated {num_policies} policies x 32 episodes: {summary['total_steps']} steps in "
+                 f"{summary['seconds']:.2f}s, episode length {min(lengths):.1f}-{max(lengths):.1f} steps, "
+                 f"{sum(policy['lap_completion'] > 0 for policy in policies)} policies completed a lap")
+    # Every episode ending on its first step means the start position is off the track again
+    if max(lengths) <= 1 or len(set(returns)) == 1:
+        raise RuntimeError("Evaluation episodes end immediately; policies cannot be told apart")
+    results["eval_steps_per_sec"] = {"value": summary["steps_per_sec"], "unit": "steps/s",
+                                     "higher_is_better": True}
+    results["eval_100x32_seconds"] = _latency(summary["seconds"])
+
+
+# Simulated clients for the adaptive streaming ladder: name -> (link bandwidth
+# in bytes/s, decode cost in ms per megapixel, standard deviation of frame
+# arrival jitter in seconds, seconds between reports)
+SIMULATED_CLIENTS = {
+    "fast": (20e6, 3.0, 0.0, 2.0),
+    "dsl": (400e3, 5.0, 0.0, 2.0),
+    "mobile": (60e3, 10.0, 0.0, 2.0),
+    "slow_device": (20e6, 100.0, 0.0, 2.0),
+    "fast_jitter_20ms": (20e6, 3.0, 0.02, 2.0),
+    "fast_jitter_50ms": (20e6, 3.0, 0.05, 2.0),
+    "dsl_jitter_50ms": (400e3, 5.0, 0.05, 2.0),
+    "mobile_jitter_50ms": (60e3, 10.0, 0.05, 2.0),
+    "fast_short_window": (20e6, 3.0, 0.05, 0.5),
+    "dsl_short_window": (400e3, 5.0, 0.05, 0.5),
+}
+
+# Extra links swept across the whole ladder, all with a 5 ms/MP decoder, each
+# run without and with arrival jitter
+SWEEP_BANDWIDTHS = np.geomspace(10e3, 2e6, 40)
+SWEEP_JITTERS = (0.0, 0.05)
+
+
+def _simulate_client(ladder, frame_bytes, bandwidth, decode_ms_per_mp, jitter=0.0, window=2.0,
+                     duration=120.0, seed=0):
+    import streaming
+
+    rng = np.random.default_rng(seed)
+    controller = streaming.AdaptiveBitrate(ladder)
+
+    def decode_ms(level):
+        pixels = (800 // level.downscale) * (600 // level.downscale)
+        return decode_ms_per_mp * pixels / 1e6
+
+    # The server sends at the level's frame rate, or only as fast as the link
+    # carries the frames once it is too slow. Frames arrive in order, each
+    # offset from its send time by Gaussian jitter. Like templates/index.html,
+    # the client counts arrivals and restarts its window on the first frame of
+    # a new level, so the first report at a level covers a short window.
+    in_flight = collections.deque()
+    send_time = last_arrival = 0.0
+    client_level = controller.index
+    window_start = 0.0
+    frames = 0
+    history = []
+    for report in range(1, int(duration / window) + 1):
+        now = report * window
+        while send_time < now:
+            index = controller.index
+            send_time += max(1.0 / ladder[index].fps, frame_bytes[index] / bandwidth)
+            last_arrival = max(last_arrival, send_time + rng.normal(0.0, jitter))
+            in_flight.append((last_arrival, index))
+        while in_flight and in_flight[0][0] < now:
+            arrival, index = in_flight.popleft()
+            if index != client_level:
+                client_level, window_start, frames = index, arrival, 0
+            frames += 1
+        controller.report(frames, now - window_start, decode_ms(ladder[client_level]), level=client_level)
+        window_start, frames = now, 0
+        history.append(controller.index)
+
+    # Best level the simulated client can actually sustain, worked out from the
+    # link and device alone: the stream fits the bandwidth and each frame
+    # decodes within its frame interval
+    def sustainable(index):
+        level = ladder[index]
+        return (frame_bytes[index] * level.fps <= bandwidth
+                and decode_ms(level) <= 1000.0 / level.fps)
+
+    target = next((i for i in range(len(ladder)) if sustainable(i)), len(ladder) - 1)
+    # Settled once the level reaches the target and from then on only probes one step above it
+    if target not in history:
+        return target, history[-1], None
+    settled = history.index(target)
+    if any(index not in (target, target - 1) for index in history[settled:]):
+        return target, history[-1], None
+    tail = history[len(history) // 2:]
+    return target, max(set(tail), key=tail.count), settled + 1
+
+
+def bench_adaptive_streaming(results, scale):
+    import streaming
+    from game import CarRacingGame
+    from app import encode_frame
+
+    game = CarRacingGame()
+    frame = game.get_frame()
+    frame_bytes = []
+    for level in streaming.LADDER:
+        encoded = encode_frame(frame, level.format, level.quality, level.downscale)
+        frame_bytes.append(len(encoded))
+        encode_time = _measure(lambda: encode_frame(frame, level.format, level.quality, level.downscale),
+                               20 * scale)
+        results[f"abr_encode_level{streaming.LADDER.index(level)}"] = _latency(encode_time)
+
+    for name, (bandwidth, decode_ms_per_mp, jitter, window) in SIMULATED_CLIENTS.items():
+        target, steady, settled = _simulate_client(streaming.LADDER, frame_bytes, bandwidth,
+                                                   decode_ms_per_mp, jitter, window)
+        logging.info(f"Simulated {name} client: settled on level {steady} "
+                     f"(best sustainable {target}) after {settled} reports")
+        if settled is None or steady != target:
+            raise RuntimeError(f"Adaptive streaming did not converge for simulated {name} client: "
+                               f"settled on level {steady}, expected {target}")
+        results[f"abr_{name}_reports_to_settle"] = {"value": settled, "unit": "reports",
+                                                    "higher_is_better": False}
+
+    for jitter in SWEEP_JITTERS:
+        for bandwidth in SWEEP_BANDWIDTHS:
+            target, steady, settled = _simulate_client(streaming.LADDER, frame_bytes, bandwidth, 5.0, jitter)
+            if settled is None or steady != target:
+                raise RuntimeError(f"Adaptive streaming did not converge for a simulated {bandwidth / 1e3:.0f} KB/s "
+                                   f"link with {jitter * 1000:.0f} ms jitter: settled on level {steady}, "
+                                   f"expected {target}")
+    logging.info(f"All {len(SWEEP_BANDWIDTHS)} swept links settled on their best sustainable level "
+                 f"with {' and '.join(f'{jitter * 1000:.0f} ms' for jitter in SWEEP_JITTERS)} jitter")
+
+
+# Cold start of the web app in a fresh interpreter, as a gunicorn worker would see it
+_STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import app
+client = app.app.test_client()
+client.get('/health')
+health = time.perf_counter() - start
+response = client.get('/game', buffered=False)
+next(iter(response.response))
+frame = time.perf_counter() - start
+response.close()
+print(health, frame)
+"""
+
+
+def bench_startup(results, scale):
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    here = os.path.dirname(os.path.abspath(__file__))
+    health, frame = float('inf'), float('inf')
+    for _ in range(3):
+        output = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT], cwd=here, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                check=True, universal_newlines=True).stdout
+        run_health, run_frame = map(float, output.split()[-2:])
+        health, frame = min(health, run_health), min(frame, run_frame)
+    results["startup_first_health"] = _latency(health)
+    results["startup_first_frame"] = _latency(frame)
+
+
+BENCHMARKS = {
+    "env": bench_env,
+    "agent": bench_agent,
+    "game": bench_game,
+    "app": bench_app,
+    "startup": bench_startup,
+    "abr": bench_adaptive_streaming,
+    "eval": bench_evaluate,
+}
+
+
+def run(groups, scale=1):
+    results = {}
+    for name in groups:
+        logging.info(f"Running {name} benchmarks...")
+        group_results = {}
+        BENCHMARKS[name](group_results, scale)
+        for result in group_results.values():
+            result["group"] = name
+        results.update(group_results)
+    return results
+
+
+def compare(results, baseline, threshold, groups=None):
+    regressions = []
+    # A baseline metric from a group that ran but produced no result (a skipped
+    # benchmark, a failed optional import) counts as a failure, not a pass
+    groups = set(BENCHMARKS if groups is None else groups)
+    for name, base in sorted(baseline.items()):
+        # Older baselines have no group; only hold them to account on a full run
+        group = base.get("group")
+        selected = group in groups if group else groups == set(BENCHMARKS)
+        if name not in results and selected:
+            print(f"{name:20s} {'':12s} {base['unit']:9s} "
+                  f"baseline {base['value']:12.3f} MISSING")
+            regressions.append(name)
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:20s} {result['value']:12.3f} {result['unit']:9s} (no baseline)")
+            continue
+        # Positive change means faster than the baseline, whatever the unit
+        if result["higher_is_better"]:
+            change = result["value"] / base["value"] - 1
+        else:
+            change = base["value"] / result["value"] - 1
+        regressed = change < -threshold
+        status = "REGRESSION" if regressed else "ok"
+        print(f"{name:20s} {result['value']:12.3f} {result['unit']:9s} "
+              f"baseline {base['value']:12.3f} ({change:+.1%}) {status}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the game, environment, agent and stream hot paths")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help="baseline JSON file to compare against or write to")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="record the results as the new baseline instead of comparing")
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.environ.get('BENCHMARK_THRESHOLD', DEFAULT_THRESHOLD)),
+                        help="fractional slowdown that counts as a regression (default: %(default)s)")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS),
+                        help="benchmark groups to run")
+    parser.add_argument('--scale', type=int, default=1,
+                        help="multiply iteration counts for more stable numbers")
+    parser.add_argument('--output', help="also write the raw results to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = run(args.only, args.scale)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline with {len(results)} metrics to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+    regressions = compare(results, baseline, args.threshold, args.only)
+    if regressions:
+        print(f"{len(regressions)} metric(s) missing or regressed by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,21 +2,32 @@ import pygame
 import numpy as np
 import math
 
+# Agent action index -> [acceleration, steering]: accelerate, brake, left, right
+ACTIONS = [[1, 0], [-1, 0], [0, -1], [0, 1]]
+
 class CarRacingEnv:
-    def __init__(self, width=800, height=600):
+    def __init__(self, width=800, height=600, fps=60):
         pygame.init()
         self.width = width
         self.height = height
+        self.fps = fps  # None disables the frame rate limiter
         self.screen = pygame.display.set_mode((width, height), pygame.DOUBLEBUF | pygame.HWSURFACE)
         pygame.display.set_caption("Car Racing Game")
         
+        # Track properties
+        self.track_width = 200
+        self.track_center_x = width // 2
+        self.track_center_y = height // 2
+        self.track_radius = 200
+        
         # Car properties
         self.car_width = 40
         self.car_height = 20
         self.car_speed = 0
         self.car_angle = 0
-        self.car_x = width // 2
-        self.car_y = height // 2
+        # Start player car on the track, as CarRacingGame does
+        self.car_x = self.track_center_x + self.track_radius
+        self.car_y = self.track_center_y
         self.max_speed = 5
         self.acceleration = 0.1
         self.deceleration = 0.05
@@ -28,12 +39,6 @@ class CarRacingEnv:
         self.ai_car_speed = 0
         self.ai_car_angle = 0
         
-        # Track properties
-        self.track_width = 200
-        self.track_center_x = width // 2
-        self.track_center_y = height // 2
-        self.track_radius = 200
-        
         # Colors
         self.car_color = (255, 0, 0)  # Red for player car
         self.ai_car_color = (0, 0, 255)  # Blue for AI car
@@ -44,8 +49,8 @@ class CarRacingEnv:
         self.running = True
         
     def reset(self):
-        self.car_x = self.width // 2
-        self.car_y = self.height // 2
+        self.car_x = self.track_center_x + self.track_radius
+        self.car_y = self.track_center_y
         self.car_speed = 0
         self.car_angle = 0
         self.ai_car_x = self.width // 4
@@ -122,7 +127,8 @@ class CarRacingEnv:
         done = not player_on_track
         
         # Render at consistent frame rate
-        self.clock.tick(60)
+        if self.fps:
+            self.clock.tick(self.fps)
         
         return self._get_state(), reward, done
     
@@ -179,4 +185,116 @@ class CarRacingEnv:
     
     def close(self):
         self.running = False
-        pygame.quit() 
\ No newline at end of file
+        pygame.quit() 
+
+class BatchCarRacingEnv:
+    # NumPy-vectorized copy of CarRacingEnv's physics that steps num_envs
+    # episodes at once, for fast headless evaluation. It does not touch pygame,
+    # so there is no rendering and no frame rate limit. It also tracks how far
+    # each player car has travelled around the track while on it, in laps.
+    def __init__(self, num_envs, width=800, height=600):
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        
+        # Same constants as CarRacingEnv
+        self.max_speed = 5
+        self.acceleration = 0.1
+        self.turn_speed = 3
+        self.track_width = 200
+        self.track_center_x = width // 2
+        self.track_center_y = height // 2
+        self.track_radius = 200
+        
+        self.reset()
+    
+    def reset(self):
+        n = self.num_envs
+        self.car_x = np.full(n, self.track_center_x + self.track_radius, dtype=np.float64)
+        self.car_y = np.full(n, self.track_center_y, dtype=np.float64)
+        self.car_speed = np.zeros(n)
+        self.car_angle = np.zeros(n)
+        self.ai_car_x = np.full(n, self.width // 4, dtype=np.float64)
+        self.ai_car_y = np.full(n, self.height // 4, dtype=np.float64)
+        self.ai_car_speed = np.zeros(n)
+        self.ai_car_angle = np.zeros(n)
+        self.track_progress = np.zeros(n)  # Signed radians travelled around the track center
+        self._track_angle = self._angle_around_track(self.car_x, self.car_y)
+        return self._get_state()
+    
+    @property
+    def laps(self):
+        return np.abs(self.track_progress) / (2 * math.pi)
+    
+    def _get_state(self):
+        # One row per env, same layout as CarRacingEnv._get_state()
+        return np.stack([
+            self.car_x / self.width,
+            self.car_y / self.height,
+            self.car_speed / self.max_speed,
+            self.car_angle / 360,
+            self.ai_car_x / self.width,
+            self.ai_car_y / self.height,
+            self.ai_car_speed / self.max_speed,
+            self.ai_car_angle / 360
+        ], axis=1)
+    
+    def _angle_around_track(self, x, y):
+        return np.arctan2(y - self.track_center_y, x - self.track_center_x)
+    
+    def step(self, actions):
+        # actions: (num_envs, 2) array of [acceleration, steering]
+        actions = np.asarray(actions, dtype=np.float64)
+        
+        # Update player car
+        self.car_speed += actions[:, 0] * self.acceleration
+        np.clip(self.car_speed, -self.max_speed, self.max_speed, out=self.car_speed)
+        self.car_angle += actions[:, 1] * self.turn_speed
+        
+        # Apply friction/drag
+        self.car_speed *= 0.98
+        
+        self._update_ai_car()
+        
+        # Update positions
+        car_radians = np.radians(self.car_angle)
+        self.car_x += self.car_speed * np.cos(car_radians)
+        self.car_y += self.car_speed * np.sin(car_radians)
+        
+        # Keep cars within screen bounds
+        np.clip(self.car_x, 0, self.width, out=self.car_x)
+        np.clip(self.car_y, 0, self.height, out=self.car_y)
+        np.clip(self.ai_car_x, 0, self.width, out=self.ai_car_x)
+        np.clip(self.ai_car_y, 0, self.height, out=self.ai_car_y)
+        
+        player_on_track = self._is_on_track(self.car_x, self.car_y)
+        
+        # Track lap progress, unwrapping the angle across the -pi/pi seam.
+        # Only moves made on the track count; off it the episode is over.
+        track_angle = self._angle_around_track(self.car_x, self.car_y)
+        delta = (track_angle - self._track_angle + math.pi) % (2 * math.pi) - math.pi
+        self.track_progress += np.where(player_on_track, delta, 0.0)
+        self._track_angle = track_angle
+        reward = np.where(player_on_track, 0.1 + np.abs(self.car_speed) * 0.01, -0.1)
+        done = ~player_on_track
+        
+        return self._get_state(), reward, done
+    
+    def _is_on_track(self, x, y):
+        distance = np.sqrt((x - self.track_center_x)**2 + (y - self.track_center_y)**2)
+        return np.abs(distance - self.track_radius) < self.track_width / 2
+    
+    def _update_ai_car(self):
+        angle_to_center = np.degrees(np.arctan2(self.track_center_y - self.ai_car_y,
+                                                self.track_center_x - self.ai_car_x))
+        distance = np.sqrt((self.ai_car_x - self.track_center_x)**2 +
+                           (self.ai_car_y - self.track_center_y)**2)
+        
+        target_speed = self.max_speed * (1 - np.abs(distance - self.track_radius) / (self.track_width / 2))
+        self.ai_car_speed += (target_speed - self.ai_car_speed) * 0.1
+        self.ai_car_speed *= 0.98
+        
+        ai_radians = np.radians(angle_to_center)
+        self.ai_car_x += self.ai_car_speed * np.cos(ai_radians)
+        self.ai_car_y += self.ai_car_speed * np.sin(ai_radians)
+        self.ai_car_angle = angle_to_center
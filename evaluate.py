@@ -0,0 +1,179 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from car_racing_env import ACTIONS, BatchCarRacingEnv
+
+STATE_SIZE = 8  # From CarRacingEnv._get_state()
+
+_ACTIVATIONS = {
+    'relu': lambda x: np.maximum(x, 0),
+    'linear': lambda x: x,
+}
+
+
+def _checkpoint_sort_key(path):
+    # models/car_racing_dqn_{e}.h5 sorts by episode number, not as text; the
+    # extension is stripped first so the 5 in .h5 is not taken for it
+    match = re.search(r'(\d+)(?:\.weights)?\.h5$', os.path.basename(path))
+    return (int(match.group(1)) if match else -1, path)
+
+
+def find_checkpoints(patterns):
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*.h5')
+        matches = glob.glob(pattern)
+        if not matches:
+            raise FileNotFoundError(f"No checkpoints match {pattern}")
+        paths.extend(matches)
+    return sorted(set(paths), key=_checkpoint_sort_key)
+
+
+def load_policies(paths):
+    # Load every checkpoint through DQNAgent, then stack the dense layer
+    # weights as (checkpoints, in, out) so all of them run in one NumPy pass
+    from dqn_agent import DQNAgent
+
+    agent = DQNAgent(STATE_SIZE, len(ACTIONS))
+    activations = []
+    for layer in agent.model.layers:
+        name = layer.activation.__name__
+        if name not in _ACTIVATIONS:
+            raise ValueError(f"Unsupported activation {name!r} in layer {layer.name}")
+        activations.append(_ACTIVATIONS[name])
+
+    per_checkpoint = []
+    for path in paths:
+        agent.load(path)
+        per_checkpoint.append(agent.model.get_weights())
+
+    layers = []
+    for i, activation in enumerate(activations):
+        kernel = np.stack([weights[2 * i] for weights in per_checkpoint])
+        bias = np.stack([weights[2 * i + 1] for weights in per_checkpoint])[:, None, :]
+        layers.append((kernel, bias, activation))
+    return layers
+
+
+def q_values(layers, states):
+    # states: (checkpoints, episodes, state_size) -> (checkpoints, episodes, actions)
+    x = states
+    for kernel, bias, activation in layers:
+        x = activation(np.matmul(x, kernel) + bias)
+    return x
+
+
+def evaluate_policies(layers, episodes=32, max_steps=1000, epsilon=0.0, seed=0):
+    # Run episodes for every stacked policy at once; one result dict per policy
+    num_checkpoints = layers[0][0].shape[0]
+    rng = np.random.default_rng(seed)
+    action_table = np.array(ACTIONS, dtype=np.float64)
+
+    env = BatchCarRacingEnv(num_checkpoints * episodes)
+    states = env.reset()
+    active = np.ones(num_checkpoints * episodes, dtype=bool)
+    returns = np.zeros(num_checkpoints * episodes)
+    lengths = np.zeros(num_checkpoints * episodes, dtype=np.int64)
+    laps = np.zeros(num_checkpoints * episodes)
+
+    start = time.perf_counter()
+    for _ in range(max_steps):
+        q = q_values(layers, states.reshape(num_checkpoints, episodes, STATE_SIZE))
+        actions = q.argmax(axis=-1).reshape(-1)
+        if epsilon > 0:
+            explore = rng.random(actions.shape) < epsilon
+            actions[explore] = rng.integers(len(ACTIONS), size=explore.sum())
+
+        states, rewards, dones = env.step(action_table[actions])
+        # Finished episodes keep stepping with the rest of the batch but stop counting
+        returns += np.where(active, rewards, 0.0)
+        lengths += active
+        laps = np.where(active, env.laps, laps)
+        active &= ~dones
+        if not active.any():
+            break
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for i in range(num_checkpoints):
+        episode_slice = slice(i * episodes, (i + 1) * episodes)
+        checkpoint_returns = returns[episode_slice]
+        checkpoint_laps = laps[episode_slice]
+        checkpoint_steps = int(lengths[episode_slice].sum())
+        results.append({
+            "episodes": episodes,
+            "return_mean": float(checkpoint_returns.mean()),
+            "return_std": float(checkpoint_returns.std()),
+            "return_min": float(checkpoint_returns.min()),
+            "return_median": float(np.median(checkpoint_returns)),
+            "return_max": float(checkpoint_returns.max()),
+            "lap_completion": float((checkpoint_laps >= 1).mean()),
+            "laps_mean": float(checkpoint_laps.mean()),
+            "steps_mean": float(lengths[episode_slice].mean()),
+            "truncated": int(active[episode_slice].sum()),
+            "steps_per_sec": checkpoint_steps / elapsed if elapsed > 0 else float('inf'),
+        })
+    total_steps = int(lengths.sum())
+    summary = {
+        "checkpoints": num_checkpoints,
+        "episodes_per_checkpoint": episodes,
+        "total_steps": total_steps,
+        "seconds": elapsed,
+        "steps_per_sec": total_steps / elapsed if elapsed > 0 else float('inf'),
+    }
+    return results, summary
+
+
+def evaluate(paths, episodes=32, max_steps=1000, epsilon=0.0, seed=0):
+    layers = load_policies(paths)
+    results, summary = evaluate_policies(layers, episodes, max_steps, epsilon, seed)
+    results = [dict(checkpoint=path, **result) for path, result in zip(paths, results)]
+    return results, summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate saved DQN checkpoints without rendering")
+    parser.add_argument('checkpoints', nargs='+',
+                        help="checkpoint files, glob patterns or directories of .h5 files")
+    parser.add_argument('--episodes', type=int, default=32, help="episodes per checkpoint")
+    parser.add_argument('--max-steps', type=int, default=1000,
+                        help="truncate episodes that are still running after this many steps")
+    parser.add_argument('--epsilon', type=float, default=0.0,
+                        help="random action probability; 0 is fully greedy, which makes every "
+                             "episode of a checkpoint identical since the environment is deterministic")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write per-checkpoint results to this JSON file")
+    args = parser.parse_args(argv)
+
+    paths = find_checkpoints(args.checkpoints)
+    print(f"Evaluating {len(paths)} checkpoint(s) x {args.episodes} episode(s)...")
+    results, summary = evaluate(paths, args.episodes, args.max_steps, args.epsilon, args.seed)
+
+    ranked = sorted(results, key=lambda r: r["return_mean"], reverse=True)
+    width = max(len(os.path.basename(r["checkpoint"])) for r in ranked)
+    print(f"{'checkpoint':{width}s} {'mean':>9s} {'std':>8s} {'min':>9s} {'median':>9s} "
+          f"{'max':>9s} {'laps':>6s} {'lap%':>6s} {'steps':>8s} {'steps/s':>10s}")
+    for r in ranked:
+        print(f"{os.path.basename(r['checkpoint']):{width}s} {r['return_mean']:9.3f} {r['return_std']:8.3f} "
+              f"{r['return_min']:9.3f} {r['return_median']:9.3f} {r['return_max']:9.3f} "
+              f"{r['laps_mean']:6.2f} {r['lap_completion']:6.0%} {r['steps_mean']:8.1f} "
+              f"{r['steps_per_sec']:10.0f}")
+    print(f"{summary['total_steps']} steps in {summary['seconds']:.2f}s "
+          f"({summary['steps_per_sec']:.0f} steps/s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"summary": summary, "results": ranked}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
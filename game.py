@@ -145,6 +145,58 @@ class CarRacingGame:
         car_rect = rotated_car.get_rect(center=(int(x), int(y)))
         self.screen.blit(rotated_car, car_rect)
     
+    def update(self, action=(0, 0)):
+        # Action: [acceleration, steering]
+        # Update player car
+        self.car_speed += action[0] * self.acceleration
+        self.car_speed = max(-self.max_speed, min(self.max_speed, self.car_speed))
+        self.car_angle += action[1] * self.turn_speed
+        
+        if abs(self.car_speed) > 0:
+            self.car_speed *= 0.98
+        
+        # Calculate new position
+        new_x = self.car_x + self.car_speed * math.cos(math.radians(self.car_angle))
+        new_y = self.car_y + self.car_speed * math.sin(math.radians(self.car_angle))
+        
+        # Update position if it would keep car on track
+        if self._is_on_track(new_x, new_y):
+            self.car_x = new_x
+            self.car_y = new_y
+        else:
+            # If new position would be off track, keep current position
+            self.car_speed *= 0.5  # Slow down when hitting track boundary
+        
+        # Update AI car
+        self._update_ai_car()
+    
+    def render(self):
+        self.screen.fill(self.grass_color)
+        
+        # Draw track
+        pygame.draw.circle(self.screen, self.track_color,
+                         (int(self.track_center_x), int(self.track_center_y)),
+                         self.track_radius + self.track_width // 2)
+        pygame.draw.circle(self.screen, self.grass_color,
+                         (int(self.track_center_x), int(self.track_center_y)),
+                         self.track_radius - self.track_width // 2)
+        
+        # Draw cars
+        self._draw_car(self.car_x, self.car_y, self.car_angle, self.car_color)
+        self._draw_car(self.ai_car_x, self.ai_car_y, self.ai_car_angle, self.ai_car_color)
+    
+    def capture_frame(self):
+        # Row-major (height, width, 3) copy of the screen. Going through bytes
+        # keeps it contiguous, which PIL needs to avoid another copy.
+        data = pygame.image.tostring(self.screen, 'RGB')
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)
+    
+    def get_frame(self):
+        # Advance the simulation one tick and return the rendered frame
+        self.update()
+        self.render()
+        return self.capture_frame()
+    
     def run(self):
         self.reset()
         
@@ -170,43 +222,8 @@ class CarRacingGame:
             elif keys[pygame.K_RIGHT]:
                 action[1] = 1
             
-            # Update player car
-            self.car_speed += action[0] * self.acceleration
-            self.car_speed = max(-self.max_speed, min(self.max_speed, self.car_speed))
-            self.car_angle += action[1] * self.turn_speed
-            
-            if abs(self.car_speed) > 0:
-                self.car_speed *= 0.98
-            
-            # Calculate new position
-            new_x = self.car_x + self.car_speed * math.cos(math.radians(self.car_angle))
-            new_y = self.car_y + self.car_speed * math.sin(math.radians(self.car_angle))
-            
-            # Update position if it would keep car on track
-            if self._is_on_track(new_x, new_y):
-                self.car_x = new_x
-                self.car_y = new_y
-            else:
-                # If new position would be off track, keep current position
-                self.car_speed *= 0.5  # Slow down when hitting track boundary
-            
-            # Update AI car
-            self._update_ai_car()
-            
-            # Render
-            self.screen.fill(self.grass_color)
-            
-            # Draw track
-            pygame.draw.circle(self.screen, self.track_color,
-                             (int(self.track_center_x), int(self.track_center_y)),
-                             self.track_radius + self.track_width // 2)
-            pygame.draw.circle(self.screen, self.grass_color,
-                             (int(self.track_center_x), int(self.track_center_y)),
-                             self.track_radius - self.track_width // 2)
-            
-            # Draw cars
-            self._draw_car(self.car_x, self.car_y, self.car_angle, self.car_color)
-            self._draw_car(self.ai_car_x, self.ai_car_y, self.ai_car_angle, self.ai_car_color)
+            self.update(action)
+            self.render()
             
             pygame.display.flip()
             self.clock.tick(60)
@@ -0,0 +1,32 @@
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# /game streams hold their connection open indefinitely. With gunicorn's default
+# sync worker one open stream would block every other request, /health
+# included, and the sync timeout would kill long streams. Threaded workers
+# serve each stream on its own thread; the timeout only applies to the
+# worker's heartbeat, not to individual requests.
+worker_class = 'gthread'
+# One worker process: the game and the adaptive stream controllers that
+# /stream/<id>/feedback updates live in that process's memory, so a second
+# worker would answer feedback for streams it does not hold with 404.
+workers = 1
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 120
+
+# GUNICORN_PRELOAD=1 initializes the game in the master before forking, so the
+# worker starts with it ready. Otherwise the worker starts serving /health
+# straight away and warms the game up in the background.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+
+
+def when_ready(server):
+    if preload_app:
+        import app
+        app.warm_up(background=False)
+
+
+def post_worker_init(worker):
+    import app
+    app.warm_up()
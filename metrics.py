@@ -0,0 +1,212 @@
+import bisect
+import os
+import threading
+import time
+
+# Set METRICS_ENABLED=0 to turn every timer into a no-op
+ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond frame work up to slow checkpoints
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _format_labels(label, value):
+    if label is None:
+        return ''
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'{label}="{escaped}"'
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Only completed stages are recorded; a client disconnect mid-send is not a sample
+        if exc_type is None:
+            self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+# Histogram of durations in seconds, one series per stage label
+class StageTimer:
+    def __init__(self, name, help, label='stage', buckets=DEFAULT_BUCKETS, enabled=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.enabled = ENABLED if enabled is None else enabled
+        self._stages = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _histogram(self, stage):
+        histogram = self._stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._stages.setdefault(stage, _Histogram(self.buckets))
+        return histogram
+
+    def time(self, stage):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._histogram(stage))
+
+    def observe(self, stage, seconds):
+        if self.enabled:
+            self._histogram(stage).observe(seconds)
+
+    def summary(self):
+        return {
+            stage: {
+                "count": h.count,
+                "total": h.sum,
+                "mean": h.sum / h.count if h.count else 0.0,
+                "max": h.max,
+            }
+            for stage, h in list(self._stages.items())
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for stage, h in sorted(self._stages.items()):
+            with h.lock:
+                counts = list(h.counts)
+                total, count = h.sum, h.count
+            labels = _format_labels(self.label, stage)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+# Label value that absorbs new keys once a LabeledValue is at max_keys
+OVERFLOW_KEY = 'other'
+
+
+# Counter or gauge with an optional single label. max_keys bounds the number
+# of series so a label fed from client input cannot grow without limit.
+class LabeledValue:
+    def __init__(self, name, help, kind='counter', label=None, enabled=None, max_keys=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.label = label
+        self.max_keys = max_keys
+        self.enabled = ENABLED if enabled is None else enabled
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, key):
+        # Call with _lock held
+        if self.max_keys is not None and key not in self._values and len(self._values) >= self.max_keys:
+            return OVERFLOW_KEY
+        return key
+
+    def inc(self, amount=1, key=None):
+        # Returns the key actually used, which is OVERFLOW_KEY when the label set is full
+        if not self.enabled:
+            return key
+        with self._lock:
+            key = self._key(key)
+            self._values[key] = self._values.get(key, 0) + amount
+        return key
+
+    def dec(self, amount=1, key=None, remove_at_zero=False):
+        if not self.enabled:
+            return
+        with self._lock:
+            value = self._values.get(key, 0) - amount
+            if remove_at_zero and value <= 0:
+                self._values.pop(key, None)
+            else:
+                self._values[key] = value
+
+    def set(self, value, key=None):
+        if not self.enabled:
+            return key
+        with self._lock:
+            key = self._key(key)
+            self._values[key] = value
+        return key
+
+    def remove(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = sorted(self._values.items(), key=lambda item: str(item[0]))
+        for key, value in values:
+            labels = _format_labels(self.label, key)
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+def render_prometheus():
+    # Prometheus text exposition format, version 0.0.4
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+def format_summary(timer):
+    summary = timer.summary()
+    wall = sum(stats["total"] for stats in summary.values()) or 1.0
+    parts = []
+    for stage, stats in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+        parts.append(f"{stage}: {stats['mean'] * 1000:.2f}ms avg, "
+                     f"{stats['max'] * 1000:.1f}ms max, {stats['total'] / wall:.0%}")
+    return " | ".join(parts)
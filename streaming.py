@@ -0,0 +1,101 @@
+from collections import namedtuple
+
+# One rung of the adaptive streaming ladder. downscale is an integer divisor of
+# the 800x600 frame so resizing can use PIL's fast box reduce.
+StreamLevel = namedtuple('StreamLevel', ['downscale', 'format', 'quality', 'fps'])
+
+# Best to worst; every step down sends fewer bytes per second and costs less to
+# encode. The game's flat colours make full-size PNG smaller than JPEG but over
+# ten times slower to encode, so the ladder stays on JPEG throughout.
+LADDER = (
+    StreamLevel(downscale=1, format='JPEG', quality=85, fps=30),
+    StreamLevel(downscale=1, format='JPEG', quality=60, fps=24),
+    StreamLevel(downscale=2, format='JPEG', quality=85, fps=24),
+    StreamLevel(downscale=2, format='JPEG', quality=60, fps=20),
+    StreamLevel(downscale=2, format='JPEG', quality=40, fps=15),
+    StreamLevel(downscale=4, format='JPEG', quality=60, fps=10),
+)
+
+START_LEVEL = 2
+
+# Seconds between client reports; matches feedbackInterval in
+# templates/index.html. The first report at a new level covers less, since the
+# client restarts its count on the first frame of that level.
+FEEDBACK_WINDOW = 2.0
+
+# How late a frame may arrive, in seconds, without counting against the
+# client. Network and decode jitter move frames across the edge of a report
+# window, so a healthy client can come up a few frames short in any one report.
+ARRIVAL_JITTER = 0.2
+
+
+class AdaptiveBitrate:
+    # Moves one client along the ladder from its frame count/decode-time reports.
+    # Steps down on the first congested report. Probes a better level once the
+    # client has spent `up_after` seconds at this one without congestion and is
+    # within one frame of keeping up. A probe stays on trial for that long too;
+    # failing it doubles the wait so a client on a steady link settles instead
+    # of oscillating.
+
+    def __init__(self, ladder=LADDER, start=START_LEVEL, up_after=3 * FEEDBACK_WINDOW,
+                 max_up_after=48 * FEEDBACK_WINDOW):
+        self.ladder = ladder
+        self.index = max(0, min(len(ladder) - 1, start))
+        self.base_up_after = up_after
+        self.up_after = up_after
+        self.max_up_after = max_up_after
+        self.probing = False
+        self.level_time = 0.0
+        self.deficit = 0.0
+
+    @property
+    def level(self):
+        return self.ladder[self.index]
+
+    @property
+    def allowance(self):
+        # Frames a client may be behind: one for whole-frame counting plus
+        # ARRIVAL_JITTER worth at the current level
+        return 1.0 + self.level.fps * ARRIVAL_JITTER
+
+    def _move(self, index):
+        self.index = index
+        self.level_time = 0.0
+        self.deficit = 0.0
+
+    def is_congested(self, decode_ms):
+        # Congested once the client is further behind than the allowance, or
+        # when decoding a frame takes longer than the frame interval
+        frame_interval_ms = 1000.0 / self.level.fps
+        return self.deficit > self.allowance or decode_ms > frame_interval_ms
+
+    def report(self, frames, elapsed, decode_ms, level=None):
+        # Ignore reports measured at a level we have already moved away from
+        if level is not None and level != self.index:
+            return self.index
+
+        # Report windows at one level are back to back, so the shortfall is
+        # summed across them: jitter only moves frames between neighbouring
+        # windows, while a link that cannot keep up falls further behind with
+        # every report
+        self.deficit += self.level.fps * elapsed - frames
+        self.level_time += elapsed
+        if self.is_congested(decode_ms):
+            if self.probing:
+                self.up_after = min(self.up_after * 2, self.max_up_after)
+            self.probing = False
+            self._move(min(len(self.ladder) - 1, self.index + 1))
+            return self.index
+
+        # A link only slightly too slow for this level sits within the
+        # allowance for a while, so wait until the client has caught up to
+        # within one frame before trusting this level enough to leave it
+        if self.level_time >= self.up_after and self.deficit <= 1.0:
+            if self.probing:
+                # The better level held up, so go back to probing at the normal pace
+                self.up_after = self.base_up_after
+                self.probing = False
+            if self.index > 0:
+                self._move(self.index - 1)
+                self.probing = True
+        return self.index
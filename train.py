@@ -1,12 +1,17 @@
 import numpy as np
-from car_racing_env import CarRacingEnv
+from car_racing_env import CarRacingEnv, ACTIONS
 from dqn_agent import DQNAgent
+import metrics
 import time
 
+# Print a per-stage timing summary every N episodes
+SUMMARY_EVERY = 10
+stage_timer = metrics.StageTimer('racer_train_stage_seconds', 'Time spent in each training loop stage')
+
 def train():
     env = CarRacingEnv()
     state_size = 8  # From CarRacingEnv._get_state()
-    action_size = 4  # [accelerate, brake, left, right]
+    action_size = len(ACTIONS)  # [accelerate, brake, left, right]
     agent = DQNAgent(state_size, action_size)
     batch_size = 32
     episodes = 1000
@@ -19,21 +24,15 @@ def train():
         
         while not done:
             # Get action from agent
-            action = agent.act(state)
+            with stage_timer.time('act'):
+                action = agent.act(state)
             
             # Convert action index to actual action values
-            action_values = [0, 0]  # [acceleration, steering]
-            if action == 0:  # accelerate
-                action_values = [1, 0]
-            elif action == 1:  # brake
-                action_values = [-1, 0]
-            elif action == 2:  # left
-                action_values = [0, -1]
-            elif action == 3:  # right
-                action_values = [0, 1]
+            action_values = ACTIONS[action]  # [acceleration, steering]
             
             # Take action
-            next_state, reward, done = env.step(action_values)
+            with stage_timer.time('step'):
+                next_state, reward, done = env.step(action_values)
             next_state = np.reshape(next_state, [1, state_size])
             
             # Remember the experience
@@ -44,10 +43,12 @@ def train():
             total_reward += reward
             
             # Render the environment
-            env.render()
+            with stage_timer.time('render'):
+                env.render()
             
             # Train the agent
-            agent.replay(batch_size)
+            with stage_timer.time('replay'):
+                agent.replay(batch_size)
             
             if done:
                 print(f"episode: {e}/{episodes}, score: {total_reward}, e: {agent.epsilon:.2f}")
@@ -55,8 +56,13 @@ def train():
         
         # Update target model every 10 episodes
         if e % 10 == 0:
-            agent.update_target_model()
-            agent.save(f"models/car_racing_dqn_{e}.h5")
+            with stage_timer.time('checkpoint'):
+                agent.update_target_model()
+                agent.save(f"models/car_racing_dqn_{e}.h5")
+        
+        if stage_timer.enabled and (e + 1) % SUMMARY_EVERY == 0:
+            print(f"timings (episodes {e + 1 - SUMMARY_EVERY}-{e}): {metrics.format_summary(stage_timer)}")
+            stage_timer.reset()
     
     env.close()
 